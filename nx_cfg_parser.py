@@ -5,66 +5,110 @@ from __future__ import print_function
 import os
 import struct
 import sys
-import collections
 
 CFG_TYPE_STR = 0x01
 CFG_TYPE_U8  = 0x02
 CFG_TYPE_U32 = 0x03
 
+# Precompiled structs for the little endian fields used by config entries.
+_U32 = struct.Struct('<I')
+_U32_UNPACK = _U32.unpack_from
+_TYPE_VSZ = struct.Struct('<BI')
+_TYPE_VSZ_UNPACK = _TYPE_VSZ.unpack_from
+
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
-def printStringSetting(name, value):
-    value_str = value.decode('utf-8').strip('\x00')
-    print('%s = str!"%s"' % (name, value_str))
+def formatStringSetting(name, value):
+    # String values are NULL terminated. Skip any leading NULL padding, then slice them at the first NULL terminator before decoding.
+    value = value.lstrip(b'\x00')
+    value_end = value.find(b'\x00')
+    if value_end >= 0:
+        value = value[:value_end]
+    
+    value_str = value.decode('utf-8')
+    return f'{name} = str!"{value_str}"'
+
+def formatU8Setting(name, value):
+    return f'{name} = u8!0x{value[0]:X}'
 
-def printU8Setting(name, value):
-    print('%s = u8!0x%X' % (name, value[0]))
+def formatU32Setting(name, value):
+    value_u32 = int.from_bytes(value, 'little')
+    return f'{name} = u32!0x{value_u32:X}'
 
-def printU32Setting(name, value):
-    value_u32 = struct.unpack('<I', value)[0]
-    print('%s = u32!0x%X' % (name, value_u32))
+# Format functions for each config entry type, indexed by type. Config entry types are dense, so a tuple is used instead of a dictionary.
+_CFG_TYPE_FUNCS = (None, formatStringSetting, formatU8Setting, formatU32Setting)
 
-def parseSystemSettings(path, size):
-    # Create a dictionary to easily handle different config entry types.
-    cfg_type_dict = {
-        CFG_TYPE_STR: printStringSetting,
-        CFG_TYPE_U8:  printU8Setting,
-        CFG_TYPE_U32: printU32Setting
-    }
+def writeLines(lines):
+    if not lines:
+        return
     
+    # Write all output lines to stdout at once. The text layer from stdout takes care of encoding and newline translation.
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+def parseSystemSettings(path, size):
     # Used to hold parsed configuration entries.
     cfg = {}
     
     # Open settings file.
     try:
-        file = open(path, "rb")
+        fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
     except:
         eprint('Failed to open file!')
         return
     
+    # Read the whole settings file in a single call, bypassing the buffered I/O stack. Config entries are parsed by advancing an offset into the read data.
+    try:
+        # Let the kernel know we're reading the file sequentially, if possible. This is just a hint, so errors are ignored.
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(fd, 0, size, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        
+        # A single read() call may return less data than requested (e.g. it's capped at 0x7FFFF000 bytes on Linux), so keep reading until we get everything or reach EOF.
+        chunks = []
+        remaining = size
+        while remaining:
+            chunk = os.read(fd, remaining)
+            if not chunk:
+                break
+            
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        
+        data = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+    except OSError:
+        data = b''
+    finally:
+        os.close(fd)
+    
+    if len(data) != size:
+        eprint('Failed to read file!')
+        return
+    
     # Double check settings file size by reading the first four bytes.
-    settings_size = struct.unpack('<I', file.read(4))[0]
+    settings_size = _U32_UNPACK(data, 0)[0]
     if settings_size != size:
         eprint('File size in header doesn\'t match actual file size!')
-        file.close()
         return
     
     offset = 4
     error = False
     
-    # Parse settings file.
-    while offset < size:
+    # Cache the bound setdefault method from our config dictionary.
+    cfg_setdefault = cfg.setdefault
+    
+    # Used to hold decoded owner strings, keyed by their raw bytes. Settings files only have a handful of different owners, so each one is decoded just once.
+    owner_cache = {}
+    owner_cache_get = owner_cache.get
+    
+    # Parse settings file. The loop condition also makes sure the name size field from each config entry is available.
+    while (offset + 4) <= size:
         entry_offset = offset
         
-        # Safety check.
-        if (offset + 4) > size:
-            eprint('Invalid name size field length for config entry at offset 0x%X (0x%X byte[s] left).' % (entry_offset, size - offset))
-            error = True
-            break
-        
         # Get name size.
-        name_size = struct.unpack('<I', file.read(4))[0]
+        name_size = _U32_UNPACK(data, offset)[0]
         offset += 4
         
         # Safety check.
@@ -73,78 +117,83 @@ def parseSystemSettings(path, size):
             error = True
             break
         
-        # Get actual name and stringify it. It's actual length should be a byte less than the retrieved name size (which holds a NULL terminator).
-        name = file.read(name_size).decode('utf-8').strip('\x00')
-        if len(name) != (name_size - 1):
+        # Check the NULL terminator from the config entry name. It's included in the retrieved name size, and it must be the only NULL byte in the name.
+        name_end = offset + name_size - 1
+        if data.find(b'\x00', offset, name_end + 1) != name_end:
             eprint('Invalid stringified name length for config entry at offset 0x%X.' % (entry_offset))
             error = True
             break
         
-        offset += name_size
-        
         # An exclamation mark is always used to divide the config entry owner and the actual config entry name.
-        name_start = name.find('!')
-        if (name_start < 0):
+        # It's looked up in the raw name bytes: it's an ASCII character, so it can't be part of a multi-byte UTF-8 sequence.
+        name_sep = data.find(b'!', offset, name_end)
+        if name_sep < 0:
             eprint('Name for config entry at offset 0x%X doesn\'t hold an owner.' % (entry_offset))
             error = True
             break
         
-        # Slice the read string to get the actual owner and name strings.
-        owner = name[:name_start]
-        name = name[name_start+1:]
+        # Decode the owner and name strings separately.
+        owner_bytes = data[offset:name_sep]
+        owner = owner_cache_get(owner_bytes)
+        if owner is None:
+            owner = owner_cache[owner_bytes] = owner_bytes.decode('utf-8')
+        
+        name = data[name_sep+1:name_end].decode('utf-8')
+        offset += name_size
         
         # Get config entry type and config value size.
-        (type, value_size) = struct.unpack('<BI', file.read(5))
+        (type, value_size) = _TYPE_VSZ_UNPACK(data, offset)
         offset += 5
         
-        # Safety check.
-        if (offset + value_size) > size:
+        # Safety checks.
+        value_end = offset + value_size
+        if value_end > size:
             eprint('Invalid value field length for config entry at offset 0x%X (0x%X byte[s] left, 0x%X-byte long value).' % (entry_offset, size - offset, value_size))
             error = True
             break
         
-        # Get config value.
-        value = file.read(value_size)
-        offset += value_size
-        
-        # Safety check.
-        if ((type == CFG_TYPE_U8) and (len(value) != 1)) or ((type == CFG_TYPE_U32) and (len(value) != 4)):
+        if ((type == CFG_TYPE_U8) and (value_size != 1)) or ((type == CFG_TYPE_U32) and (value_size != 4)):
             eprint('Value size doesn\'t match entry type for config entry at offset 0x%X.' % (entry_offset))
             error = True
             break
         
-        # Get dictionary for this owner.
-        owner_cfg = cfg.get(owner, {})
-        
-        # Update config entry.
-        owner_cfg.update({name: (entry_offset, type, value)})
+        # Get config value.
+        value = data[offset:value_end]
+        offset = value_end
         
-        # Update owner dictionary.
-        cfg.update({owner: owner_cfg})
+        # Update config entry within the dictionary for this owner.
+        cfg_setdefault(owner, {})[name] = (entry_offset, type, value)
     
-    file.close()
+    # Safety check. Any leftover bytes are too short to hold the name size field from another config entry.
+    if (not error) and (offset < size):
+        eprint('Invalid name size field length for config entry at offset 0x%X (0x%X byte[s] left).' % (offset, size - offset))
+        error = True
     
     if error == True:
         return
     
+    # Used to hold output lines.
+    out = []
+    
     # Print ordered config entries.
-    ordered_cfg = collections.OrderedDict(sorted(cfg.items()))
-    for (owner, owner_cfg) in ordered_cfg.items():
-        print('[%s]' % (owner))
+    for (owner, owner_cfg) in sorted(cfg.items()):
+        out.append(f'[{owner}]')
         
-        ordered_owner_cfg = collections.OrderedDict(sorted(owner_cfg.items()))
-        for (name, properties) in ordered_owner_cfg.items():
+        for (name, properties) in sorted(owner_cfg.items()):
             (entry_offset, type, value) = properties
             
-            # Use our dictionary to retrieve a proper print function for the current config entry type.
-            print_func = cfg_type_dict.get(type, None)
-            if not print_func:
+            # Use our tuple to retrieve a proper format function for the current config entry type.
+            format_func = _CFG_TYPE_FUNCS[type] if CFG_TYPE_STR <= type <= CFG_TYPE_U32 else None
+            if not format_func:
+                writeLines(out)
                 eprint('Unknown config value type for entry at offset 0x%X (0x%02X).' % (entry_offset, type))
                 return
             
-            print_func(name, value)
+            out.append(format_func(name, value))
         
-        print()
+        out.append('')
+    
+    writeLines(out)
 
 def main():
     # Check number of provided arguments.